@@ -0,0 +1,256 @@
+"""
+Executors for running magnetogram processing tasks, either locally or on a
+dask.distributed cluster.
+"""
+from abc import ABC, abstractmethod
+from collections import deque
+import functools
+import multiprocessing
+import multiprocessing.connection
+
+import psutil
+
+
+class ExecutorFactory:
+    def __new__(self, name, **kwargs):
+        try:
+            return executors[name](**kwargs)
+        except KeyError:
+            raise RuntimeError(f"No executor registered for {name}")
+
+
+class WorkerLostError(RuntimeError):
+    """
+    Raised when a worker process exits without returning a result.
+    """
+
+
+class Executor(ABC):
+    def __init__(self, nworkers=1, retries=0, memory_limit=None):
+        """
+        Parameters
+        ----------
+        nworkers : int
+            Number of tasks to run at the same time.
+        retries : int
+            Number of times to re-run a task that fails.
+        memory_limit : int, optional
+            Maximum resident memory in bytes that a single task may use.
+        """
+        self.nworkers = nworkers
+        self.retries = retries
+        self.memory_limit = memory_limit
+
+    @abstractmethod
+    def map(self, func, items):
+        """
+        Run ``func`` on each of ``items``.
+
+        Results are yielded as ``(item, result)`` pairs in the order tasks
+        finish. If a task still fails after all retries the exception it
+        raised is returned as the result instead.
+        """
+
+
+def _run_task(func, item, conn):
+    """
+    Run a single task in a worker process, and send the result back.
+    """
+    try:
+        result = (True, func(item))
+    except Exception as e:
+        result = (False, e)
+    conn.send(result)
+    conn.close()
+
+
+class LocalExecutor(Executor):
+    """
+    Run tasks in local processes.
+
+    Each task is run in a new process, which is then deleted along with its
+    memory. This is an embarassingly awful method of avoiding memory leaks
+    when processing lots of magnetograms.
+
+    Tasks whose process exits without a result (e.g. a segfault) fail with
+    `WorkerLostError`, and tasks whose resident memory goes over
+    ``memory_limit`` are killed and fail with `MemoryError`.
+    """
+    # Seconds between checks on the memory use of running tasks
+    poll_interval = 0.5
+
+    def _start(self, func, item):
+        recv, send = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_run_task,
+                                          args=(func, item, send))
+        process.start()
+        # Only the worker should hold the sending end, so that recv() fails
+        # instead of blocking if the worker dies
+        send.close()
+        return process, recv
+
+    def _over_memory_limit(self, process):
+        if self.memory_limit is None:
+            return False
+        try:
+            rss = psutil.Process(process.pid).memory_info().rss
+        except psutil.NoSuchProcess:
+            return False
+        return rss > self.memory_limit
+
+    def _check(self, process, recv):
+        """
+        Return ``(done, ok, result)`` for a running task.
+        """
+        if recv.poll():
+            try:
+                ok, result = recv.recv()
+            except EOFError:
+                process.join()
+                return True, False, WorkerLostError(
+                    f'Worker exited with code {process.exitcode}')
+            process.join()
+            return True, ok, result
+        if not process.is_alive():
+            # Check again, in case the result arrived just before exiting
+            if recv.poll():
+                return self._check(process, recv)
+            return True, False, WorkerLostError(
+                f'Worker exited with code {process.exitcode}')
+        if self._over_memory_limit(process):
+            process.kill()
+            process.join()
+            return True, False, MemoryError(
+                f'Worker used more than {self.memory_limit} bytes')
+        return False, None, None
+
+    def map(self, func, items):
+        pending = deque((item, 0) for item in items)
+        running = {}
+        try:
+            while pending or running:
+                while pending and len(running) < self.nworkers:
+                    item, attempt = pending.popleft()
+                    running[item] = (*self._start(func, item), attempt)
+
+                multiprocessing.connection.wait(
+                    [recv for _, recv, _ in running.values()] +
+                    [process.sentinel for process, _, _ in running.values()],
+                    timeout=self.poll_interval)
+
+                for item, (process, recv, attempt) in list(running.items()):
+                    done, ok, result = self._check(process, recv)
+                    if not done:
+                        continue
+                    recv.close()
+                    del running[item]
+                    if not ok and attempt < self.retries:
+                        print(f'Retrying {item} after error: {result!r}')
+                        pending.append((item, attempt + 1))
+                        continue
+                    yield item, result
+        finally:
+            # Don't leave workers running if the caller stops early
+            for process, recv, _ in running.values():
+                process.kill()
+                process.join()
+                recv.close()
+
+
+def _run_pickled(payload, item):
+    import cloudpickle
+
+    return cloudpickle.loads(payload)(item)
+
+
+def _run_in_subprocess(payload, memory_limit, item):
+    """
+    Run a cloudpickled task in a new process on a dask worker.
+
+    The task is pickled with cloudpickle so that functions sent from the
+    client's ``__main__`` can be passed on to the new process.
+    """
+    func = functools.partial(_run_pickled, payload)
+    for _, result in LocalExecutor(memory_limit=memory_limit).map(func, [item]):
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class DaskExecutor(Executor):
+    """
+    Run tasks on a dask.distributed cluster.
+
+    As with `LocalExecutor`, each task runs in a new process (started by the
+    dask worker) to avoid memory leaks building up in the workers. Tasks
+    whose process exits without a result fail with `WorkerLostError`, and
+    tasks whose resident memory goes over ``memory_limit`` are killed and
+    fail with `MemoryError`. Both are retried up to ``retries`` times.
+
+    If ``scheduler`` is not given a `~distributed.LocalCluster` is started
+    with ``nworkers`` single-threaded worker processes. Otherwise the
+    workers of the existing cluster must:
+
+    - be started with ``DASK_DISTRIBUTED__WORKER__DAEMON=False`` so they can
+      start new processes.
+    - be able to import ``executors`` and ``magnetogram``.
+    - see the magnetogram and output directories at the same paths as the
+      client.
+
+    The dask worker memory limits of an existing cluster still apply to the
+    worker as a whole. If a worker is killed by its nanny the scheduler
+    re-runs the task up to ``distributed.scheduler.allowed-failures`` times
+    (independent of ``retries``), and then the result is a
+    `~distributed.KilledWorker` error.
+    """
+    def __init__(self, scheduler=None, **kwargs):
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+
+    def _client(self):
+        from dask.distributed import Client
+
+        if self.scheduler is not None:
+            return Client(self.scheduler)
+        # Memory is managed per-task in _run_in_subprocess, so turn off the
+        # worker memory thresholds which would otherwise pause or restart
+        # whole workers
+        return Client(n_workers=self.nworkers, threads_per_worker=1,
+                      processes=True, memory_limit=0)
+
+    def _config(self):
+        return {
+            # Allow workers to start a new process for each task
+            'distributed.worker.daemon': False,
+            'distributed.worker.memory.target': False,
+            'distributed.worker.memory.spill': False,
+            'distributed.worker.memory.pause': False,
+            'distributed.worker.memory.terminate': False,
+            # If a worker is lost anyway, only re-run tasks `retries` times
+            'distributed.scheduler.allowed-failures': self.retries,
+        }
+
+    def map(self, func, items):
+        import cloudpickle
+        import dask
+        from dask.distributed import as_completed
+
+        task = functools.partial(_run_in_subprocess, cloudpickle.dumps(func),
+                                 self.memory_limit)
+        with dask.config.set(self._config()), self._client() as client:
+            items = list(items)
+            futures = client.map(task, items, retries=self.retries,
+                                 pure=False)
+            future_items = dict(zip(futures, items))
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                yield future_items[future], result
+                # Free results on the cluster as soon as they are consumed
+                future.release()
+
+
+executors = {'local': LocalExecutor,
+             'dask': DaskExecutor}
@@ -19,6 +19,10 @@ import pfsspy.utils
 
 import map
 
+# Bin edges for footpoint maps
+footpoint_lon_edges = np.linspace(0, 360, 361)
+footpoint_sinlat_edges = np.linspace(-1, 1, 181)
+
 
 class MagnetogramFactory:
     def __new__(self, filepath, nr, rss, nlon, nlat, source):
@@ -129,6 +133,28 @@ class Magnetogram:
         # Only want to save source surface values of open field lines
         return all_b[self.is_open_fline]
 
+    @cached_property
+    def open_footpoint_maps(self):
+        """
+        Number of open field line footpoints, and open flux, binned on a
+        regular longitude, sin(latitude) grid.
+
+        Returns
+        -------
+        count, flux : numpy.ndarray
+            Arrays of shape (360, 180), indexed by (longitude, latitude).
+            ``flux`` is the sum of the unsigned source surface field of the
+            open field lines rooted in each bin.
+        """
+        feet = self.fline_feet_coords
+        lon = feet.lon.to_value(u.deg)
+        sinlat = np.sin(feet.lat.to_value(u.rad))
+        bins = (footpoint_lon_edges, footpoint_sinlat_edges)
+        count, _, _ = np.histogram2d(lon, sinlat, bins=bins)
+        flux, _, _ = np.histogram2d(lon, sinlat, bins=bins,
+                                    weights=np.abs(self.b_at_ss))
+        return count, flux
+
     @cached_property
     def is_open_fline(self):
         """
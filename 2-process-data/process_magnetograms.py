@@ -1,7 +1,6 @@
 import argparse
 import functools
 import glob
-import multiprocessing
 import pathlib
 
 import astropy.units as u
@@ -11,7 +10,9 @@ from matplotlib.colors import Normalize
 import matplotlib.pyplot as plt
 import numpy as np
 
-from magnetogram import MagnetogramFactory
+from executors import ExecutorFactory, executors
+from magnetogram import (MagnetogramFactory, footpoint_lon_edges,
+                         footpoint_sinlat_edges)
 
 # Directory with magnetograms
 magnetogram_dir = pathlib.Path('/Volumes/Work/synoptic_data')
@@ -32,8 +33,40 @@ rss = 2.0
 parser = argparse.ArgumentParser(description='Process magnetograms.')
 parser.add_argument('data_source', type=str, help='Data source',
                     choices=['gong', 'kpvt', 'solis', 'mdi'])
+parser.add_argument('--magnetogram-dir', type=pathlib.Path,
+                    default=magnetogram_dir,
+                    help='Directory with magnetograms to process')
+parser.add_argument('--output-dir', type=pathlib.Path, default=output_dir,
+                    help='Directory to save results to. When running on a '
+                    'cluster this must be shared between all the workers.')
+parser.add_argument('--footpoint-maps', action='store_true',
+                    help='Also save maps of open field footpoint density and '
+                    'open flux')
+parser.add_argument('--executor', type=str, default='local',
+                    choices=list(executors),
+                    help='Where to run tasks: local processes, or a '
+                    'dask.distributed cluster')
+parser.add_argument('--scheduler', type=str, default=None,
+                    help='Address of a running dask scheduler. If not given '
+                    'with --executor dask a local cluster is started.')
+parser.add_argument('--nworkers', type=int, default=None,
+                    help='Number of magnetograms to process at once (default 1)')
+parser.add_argument('--retries', type=int, default=0,
+                    help='Number of times to retry a failed magnetogram')
+parser.add_argument('--memory-limit', type=float, default=None,
+                    help='Resident memory limit in GB for each task. Each '
+                    'task runs in its own process, which is killed if it '
+                    'goes over the limit.')
 args = parser.parse_args()
+if args.scheduler is not None:
+    if args.executor != 'dask':
+        parser.error('--scheduler can only be used with --executor dask')
+    if args.nworkers is not None:
+        parser.error('--nworkers is set by the number of dask workers when '
+                     'using --scheduler')
 source = args.data_source
+magnetogram_dir = args.magnetogram_dir
+output_dir = args.output_dir
 
 
 def save_to_png(m, fname):
@@ -45,7 +78,7 @@ def save_to_png(m, fname):
     plt.close('all')
 
 
-def process_single_magnetogram(source, path):
+def process_single_magnetogram(source, path, footpoint_maps=False):
     """
     Process a single magnetogram and save outputs.
 
@@ -55,13 +88,20 @@ def process_single_magnetogram(source, path):
         Source name.
     path: pathlib.Path
         Path to magnetogram file.
+    footpoint_maps: bool
+        If `True`, also save binned maps of the open field footpoints.
+
+    Returns
+    -------
+    pathlib.Path or None
+        Path to the saved results, or `None` if the magnetogram was skipped.
     """
     print(f'Processing {path}')
     m = MagnetogramFactory(path, nr, rss, nlon, nlat, source)
     if np.any(~np.isfinite(m.data)):
         nonfin = np.sum(~np.isfinite(m.data))
         print(f'Skipping {path}, has {nonfin} non-finite data points')
-        return
+        return None
 
     rss_str = str(int(rss * 10))
     (output_dir / source / 'png').mkdir(parents=True, exist_ok=True)
@@ -96,7 +136,18 @@ def process_single_magnetogram(source, path):
 
     fname = output_dir / source / rss_str / f'{date_str}.npz'
     np.savez(fname, lats=lats, lons=lons, b_feet=b_feet, b_all=b_all, b_ss=b_ss)
+
+    if footpoint_maps:
+        # Saved in a sub-directory so they aren't picked up when globbing for
+        # the main results files
+        (output_dir / source / rss_str / 'footpoints').mkdir(exist_ok=True)
+        count, flux = m.open_footpoint_maps
+        np.savez(output_dir / source / rss_str / 'footpoints' / f'{date_str}.npz',
+                 count=count, flux=flux,
+                 lon_edges=footpoint_lon_edges,
+                 sinlat_edges=footpoint_sinlat_edges)
     print(f'✅ Processed {path}')
+    return fname
 
 
 def get_fnames(directory):
@@ -118,10 +169,19 @@ if __name__ == '__main__':
     directory = f'{magnetogram_dir}/{source}'
     fnames = get_fnames(directory)[::-1]
     print(f"Found {len(fnames)} files in {directory}")
-    func = functools.partial(process_single_magnetogram, source)
-    for fname in fnames:
-        # Using mutliprocessing here is an embarassingly awful method of
-        # avoiding memory leaks by running each magnetogram in its own
-        # thread which is then deleted along with its memory.
-        with multiprocessing.Pool(1) as p:
-            p.map(func, [fname])
+    func = functools.partial(process_single_magnetogram, source,
+                             footpoint_maps=args.footpoint_maps)
+    memory_limit = args.memory_limit
+    if memory_limit is not None:
+        memory_limit = int(memory_limit * 1e9)
+    nworkers = 1 if args.nworkers is None else args.nworkers
+    executor_kwargs = dict(nworkers=nworkers, retries=args.retries,
+                           memory_limit=memory_limit)
+    if args.executor == 'dask':
+        executor_kwargs['scheduler'] = args.scheduler
+    executor = ExecutorFactory(args.executor, **executor_kwargs)
+    # Each result is written to output_dir by the task itself, so results
+    # are available as soon as each task finishes
+    for fname, result in executor.map(func, fnames):
+        if isinstance(result, Exception):
+            print(f'❌ Failed to process {fname}: {result!r}')
@@ -0,0 +1,123 @@
+import functools
+import os
+import time
+
+import pytest
+
+from executors import DaskExecutor, LocalExecutor, WorkerLostError
+
+
+def double(x):
+    time.sleep(x)
+    return 2 * x
+
+
+def fail(x):
+    raise ValueError(f'Failed on {x}')
+
+
+def fail_once(directory, x):
+    # Use a file to remember previous attempts, since each attempt may run
+    # in a different process
+    marker = directory / f'{x}.txt'
+    if not marker.exists():
+        marker.touch()
+        raise ValueError(f'Failed on {x}')
+    return x
+
+
+def exit_worker(x):
+    os._exit(1)
+
+
+leaked = []
+
+
+def leak_memory(x):
+    leaked.append(bytearray(150 * 1024**2))
+    return x
+
+
+def use_memory(x):
+    data = bytearray(500 * 1024**2)
+    time.sleep(5)
+    return len(data)
+
+
+@pytest.fixture
+def local_executor():
+    return functools.partial(LocalExecutor, nworkers=2)
+
+
+@pytest.fixture(scope='module')
+def cluster():
+    distributed = pytest.importorskip('dask.distributed')
+    with distributed.LocalCluster(n_workers=2, threads_per_worker=1,
+                                  processes=False) as cluster:
+        yield cluster
+
+
+@pytest.fixture
+def dask_executor(cluster):
+    return functools.partial(DaskExecutor, scheduler=cluster)
+
+
+@pytest.fixture
+def dask_processes_executor():
+    # Start a new process-based LocalCluster
+    pytest.importorskip('dask.distributed')
+    return functools.partial(DaskExecutor, nworkers=2)
+
+
+@pytest.fixture(params=['local', 'dask', 'dask_processes'])
+def executor(request):
+    return request.getfixturevalue(f'{request.param}_executor')
+
+
+@pytest.fixture(params=['local', 'dask_processes'])
+def process_executor(request):
+    return request.getfixturevalue(f'{request.param}_executor')
+
+
+def test_map(executor):
+    results = dict(executor().map(double, [0, 0.1, 0.2]))
+    assert results == {0: 0, 0.1: 0.2, 0.2: 0.4}
+
+
+def test_completion_order(executor):
+    results = list(executor().map(double, [1, 0]))
+    assert [item for item, _ in results] == [0, 1]
+
+
+def test_retry_succeeds(executor, tmp_path):
+    func = functools.partial(fail_once, tmp_path)
+    results = dict(executor(retries=1).map(func, [1, 2]))
+    assert results == {1: 1, 2: 2}
+
+
+def test_retries_exhausted(executor, tmp_path):
+    func = functools.partial(fail_once, tmp_path)
+    results = dict(executor(retries=0).map(func, [1]))
+    assert isinstance(results[1], ValueError)
+
+    results = dict(executor(retries=2).map(fail, [1]))
+    assert isinstance(results[1], ValueError)
+
+
+def test_worker_lost(process_executor):
+    results = dict(process_executor(retries=1).map(exit_worker, [1]))
+    assert isinstance(results[1], WorkerLostError)
+
+
+def test_memory_limit(process_executor):
+    executor = process_executor(memory_limit=100 * 1024**2)
+    results = dict(executor.map(use_memory, [1]))
+    assert isinstance(results[1], MemoryError)
+
+
+def test_memory_leak(process_executor):
+    # Each task leaks memory, which should be freed when its process exits
+    executor = process_executor(nworkers=1, retries=1,
+                                memory_limit=400 * 1024**2)
+    results = dict(executor.map(leak_memory, range(6)))
+    assert results == {i: i for i in range(6)}
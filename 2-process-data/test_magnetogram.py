@@ -0,0 +1,43 @@
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+import numpy as np
+
+from magnetogram import Magnetogram
+
+
+def magnetogram_with_feet(lon, lat, b_at_ss):
+    # Skip tracing by setting the cached properties directly
+    m = Magnetogram.__new__(Magnetogram)
+    m.fline_feet_coords = SkyCoord(lon=lon * u.deg, lat=lat * u.deg,
+                                   frame='heliographic_carrington',
+                                   obstime='2020-01-01')
+    m.b_at_ss = b_at_ss
+    return m
+
+
+def test_open_footpoint_maps_totals():
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(0, 360, 1000)
+    lat = rng.uniform(-90, 90, 1000)
+    b_at_ss = rng.normal(size=1000)
+    m = magnetogram_with_feet(lon, lat, b_at_ss)
+
+    count, flux = m.open_footpoint_maps
+    assert count.shape == flux.shape == (360, 180)
+    assert count.sum() == lon.size
+    np.testing.assert_allclose(flux.sum(), np.abs(b_at_ss).sum())
+
+
+def test_open_footpoint_maps_edges():
+    lon = np.array([359.9, 10, 10, 10])
+    lat = np.array([0.1, 90, -90, 31])
+    b_at_ss = np.array([1, -2, 3, -4])
+    m = magnetogram_with_feet(lon, lat, b_at_ss)
+
+    count, flux = m.open_footpoint_maps
+    # Latitude is binned in sin(latitude), so 31 deg is at sin(lat) = 0.515
+    expected = {(359, 90): 1, (10, 179): 2, (10, 0): 3, (10, 136): 4}
+    for idx, b in expected.items():
+        assert count[idx] == 1
+        assert flux[idx] == b
+    assert count.sum() == len(expected)
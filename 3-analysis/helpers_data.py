@@ -2,6 +2,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import glob
 
+import dask
+import dask.array as da
 import numpy as np
 import pandas as pd
 import xarray as xr
@@ -48,6 +50,61 @@ def load_data(files):
     return all_data
 
 
+def _load_footpoint_map(f):
+    d = np.load(f)
+    return np.stack([d[var] for var in ['count', 'flux']])
+
+
+def load_footpoint_maps(files):
+    """
+    Lazily load open field footpoint maps.
+
+    Parameters
+    ----------
+    files : list
+        Paths to main results files. The corresponding footpoint maps are
+        loaded from the ``footpoints`` sub-directory next to each file. Times
+        without a footpoint map are filled with NaN.
+
+    Returns
+    -------
+    xarray.DataArray
+        Dask backed array with dimensions (variable, time, lon, sinlat). Data
+        is only read from disk when it is computed.
+    """
+    fp_files = [Path(f).parent / 'footpoints' / Path(f).name for f in files]
+    existing = [f for f in fp_files if f.exists()]
+    if len(existing) == 0:
+        raise FileNotFoundError(
+            'No footpoint maps found. Process the magnetograms with '
+            '--footpoint-maps to create them.')
+
+    # Get the grid from the first file
+    d = np.load(existing[0])
+    lon_edges = d['lon_edges']
+    sinlat_edges = d['sinlat_edges']
+    shape = (2, lon_edges.size - 1, sinlat_edges.size - 1)
+
+    maps = []
+    dtimes = []
+    for f in fp_files:
+        dtimes.append(datetime.strptime(f.stem, dtime_fmt))
+        if (bad_dates.get(f.stem[:8], '') == f.parts[-4] or
+                not f.exists()):
+            # Fill with nans to keep the datetime index, as in load_data
+            maps.append(da.full(shape, np.nan))
+            continue
+        maps.append(da.from_delayed(dask.delayed(_load_footpoint_map)(f),
+                                    shape=shape, dtype=float))
+
+    return xr.DataArray(da.stack(maps, axis=1),
+                        dims=('variable', 'time', 'lon', 'sinlat'),
+                        coords={'variable': ['count', 'flux'], 'time': dtimes,
+                                'lon': (lon_edges[1:] + lon_edges[:-1]) / 2,
+                                'sinlat': (sinlat_edges[1:] +
+                                           sinlat_edges[:-1]) / 2})
+
+
 def all_flux(data):
     b_ss = np.abs(data.loc['b_ss'])
     allflux = np.sum(b_ss, axis=1)